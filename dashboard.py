@@ -1,8 +1,18 @@
+import io
+import re
+import uuid
 import plotly
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.express as px
+import plotly.graph_objects as go
 from datetime import datetime
+from types import SimpleNamespace
+
+try:
+    import numba
+except ImportError:
+    numba = None
 
 # Set page config
 st.set_page_config(page_title="Expenditure Analysis Dashboard", layout="wide")
@@ -13,98 +23,249 @@ st.title("Expenditure Analysis Dashboard")
 # File uploader
 uploaded_file = st.file_uploader("Upload your transactions file (CSV format)", type=["csv"])
 
-if uploaded_file is not None:
-    # Read the CSV file
-    df = pd.read_csv(uploaded_file)
+# Automatic categorization based on 'Transaction Details'
+categories_keywords = {
+    'Food and Dining': ['swiggy', 'zomato', 'ubereats', 'heisetasse', 'restaurant', 'hotel', 'food', 'dining', 'taco bell', 'domi', 'bakers', 'coffee', 'leons', 'hang out', 'third wave', 'churrolto', 'ushodaya', 'tibbs', 'koi', 'ding dong', 'cara cara'],
+    'Groceries': ['grocery', 'bigbasket', 'grofers', 'supermarket', 'milk', 'vegetables', 'blinkit', 'zepto', 'kpn', 'ushodaya'],
+    'Shopping': ['amazon', 'flipkart', 'myntra', 'shopping', 'clothing', 'electronics', 'diverse retails', 'westside', 'techmash'],
+    'Travel & Stay': ['uber', 'ola', 'rapido', 'hyderabad metro', 'brevistay'],
+    'Entertainment': ['netflix', 'prime', 'hotstar', 'movie', 'cinema', 'subscription', 'apple media', 'spotify'],
+    'Fuel': ['fuel', 'petrol'],
+    'Loan': ['Paritosh'],
+    'Investments/ Savings': ['icclgroww'],
+    'Money Received': ['received from']
+}
+
+# Fixed category set so edits can assign any category, not just those already seen
+category_dtype = pd.CategoricalDtype(list(categories_keywords.keys()) + ['Other'])
+
+# Regexes below are kept as pattern strings rather than re.compile objects
+# so Arrow-backed columns can match them natively.
+
+# Marker stripped from 'Tags', including any whitespace that follows it
+tag_marker_pattern = r'#\?\?\s*'
+
+# One alternation regex per category, matched against lowercased details
+category_patterns = {
+    category: '|'.join(re.escape(k.lower()) for k in keywords)
+    for category, keywords in categories_keywords.items()
+}
+
+def categorize_transactions(details_lower, tags):
+    category = pd.Series('Other', index=details_lower.index, dtype=object)
+    # Categories are checked in priority order; the first match wins
+    for cat, pattern in category_patterns.items():
+        mask = details_lower.str.contains(pattern, regex=True, na=False) & (category == 'Other')
+        category[mask] = cat
+    received = tags.str.contains('Money Received', regex=False, na=False)
+    category[received & (category == 'Other')] = 'Money Received'
+    return category
+
+# Parse, clean and categorize the uploaded file once per distinct upload.
+# Cached on the raw bytes so widget interactions reuse the prepared DataFrame.
+@st.cache_data(show_spinner=False)
+def load_and_prepare(file_bytes: bytes) -> pd.DataFrame:
+    # Read the CSV file with the Arrow parser; text columns stay Arrow-backed
+    df = pd.read_csv(
+        io.BytesIO(file_bytes),
+        engine='pyarrow',
+        dtype={'Date': 'string[pyarrow]', 'Amount': 'float64', 'Transaction Details': 'string[pyarrow]', 'Tags': 'string[pyarrow]'},
+    )
     
     # Convert 'Date' to datetime
     try:
         df['Date'] = pd.to_datetime(df['Date'], format='%d/%m/%Y')
     except KeyError:
-        st.error("CSV must contain a 'Date' column.")
-        st.stop()
+        raise ValueError("CSV must contain a 'Date' column.")
     except ValueError:
-        st.error("Invalid date format in 'Date' column. Expected format: dd/mm/yyyy")
-        st.stop()
+        raise ValueError("Invalid date format in 'Date' column. Expected format: dd/mm/yyyy")
     
     required_columns = ['Transaction Details', 'Amount', 'Tags']
     missing_cols = [col for col in required_columns if col not in df.columns]
     if missing_cols:
-        st.error(f"CSV is missing required columns: {', '.join(missing_cols)}")
-        st.stop()
+        raise ValueError(f"CSV is missing required columns: {', '.join(missing_cols)}")
     
     # Clean 'Tags' by removing '#?? '
-    df['Tags'] = df['Tags'].str.replace(r'#\?\?\s*', '', regex=True)
-    
-    # Automatic categorization based on 'Transaction Details'
-    categories_keywords = {
-        'Food and Dining': ['swiggy', 'zomato', 'ubereats', 'heisetasse', 'restaurant', 'hotel', 'food', 'dining', 'taco bell', 'domi', 'bakers', 'coffee', 'leons', 'hang out', 'third wave', 'churrolto', 'ushodaya', 'tibbs', 'koi', 'ding dong', 'cara cara'],
-        'Groceries': ['grocery', 'bigbasket', 'grofers', 'supermarket', 'milk', 'vegetables', 'blinkit', 'zepto', 'kpn', 'ushodaya'],
-        'Shopping': ['amazon', 'flipkart', 'myntra', 'shopping', 'clothing', 'electronics', 'diverse retails', 'westside', 'techmash'],
-        'Travel & Stay': ['uber', 'ola', 'rapido', 'hyderabad metro', 'brevistay'],
-        'Entertainment': ['netflix', 'prime', 'hotstar', 'movie', 'cinema', 'subscription', 'apple media', 'spotify'],
-        'Fuel': ['fuel', 'petrol'],
-        'Loan': ['Paritosh'],
-        'Investments/ Savings': ['icclgroww'],
-        'Money Received': ['received from']
-    }
-    
-    def categorize_transaction(details, tags):
-        details_lower = str(details).lower()
-        for category, keywords in categories_keywords.items():
-            for keyword in keywords:
-                if keyword in details_lower:
-                    return category
-        if 'Money Received' in tags:
-            return 'Money Received'
-        return 'Other'
-    
-    # Apply auto-categorization
-    df['Category'] = df.apply(lambda row: categorize_transaction(row['Transaction Details'], row['Tags']), axis=1)
+    df['Tags'] = df['Tags'].str.replace(tag_marker_pattern, '', regex=True)
+    
+    # Apply auto-categorization on details lowercased once up front
+    details_lower = df['Transaction Details'].astype('string[pyarrow]').str.lower()
+    df['Category'] = categorize_transactions(details_lower, df['Tags']).astype(category_dtype)
+    df['Tags'] = df['Tags'].astype('category')
+    
+    # Expenditure helpers computed once per upload rather than per rerun
+    df['Abs Amount'] = (-df['Amount']).clip(lower=0)
+    df['Is Debit'] = df['Amount'] < 0
+    return df
+
+# Expenditure sums for the current filters. The frame itself is not hashed;
+# the cache key is the data token plus the filter values that produced it.
+# Entries are capped since every session and filter combination adds one.
+@st.cache_data(show_spinner=False, max_entries=256)
+def aggregate_expenditures(_exp_df, filter_key):
+    # One grouped pass over the rows; per-tag and per-category totals are rolled up from it
+    sums = _exp_df.groupby(['Category', 'Tags'], sort=False, observed=True, dropna=False)['Abs Amount'].sum()
+    tag_sum = sums.groupby(level='Tags', observed=True).sum().reset_index()
+    category_sum = sums.groupby(level='Category', observed=True).sum().reset_index()
+    return tag_sum, category_sum
+
+# Above this many rows, totals come from a fused Numba kernel when numba is installed
+jit_row_threshold = 100_000
+
+if numba is not None:
+    # Single serial pass over the full columns: applies the filter mask and
+    # accumulates credits, debits and per-category/per-tag debit sums.
+    # Kept serial and free of dynamic globals so cache=True persists the
+    # compiled kernel, and so it is safe to launch from Streamlit's script thread.
+    @numba.njit(cache=True)
+    def aggregate_kernel(mask, amounts, cat_codes, n_cats, tag_codes, n_tags):
+        credits = 0.0
+        debits = 0.0
+        cat_acc = np.zeros(n_cats)
+        tag_acc = np.zeros(n_tags)
+        for i in range(len(amounts)):
+            if mask[i]:
+                amount = amounts[i]
+                if amount > 0:
+                    credits += amount
+                elif amount < 0:
+                    debits -= amount
+                    cat_acc[cat_codes[i]] -= amount
+                    if tag_codes[i] >= 0:
+                        tag_acc[tag_codes[i]] -= amount
+        return credits, debits, cat_acc, tag_acc
+
+# Same totals as the pandas path, for large files. Cached like aggregate_expenditures.
+@st.cache_data(show_spinner=False, max_entries=256)
+def aggregate_expenditures_jit(_df, _mask, filter_key):
+    categories = _df['Category'].cat.categories
+    tags = _df['Tags'].cat.categories
+    credits, debits, cat_totals, tag_totals = aggregate_kernel(
+        _mask,
+        _df['Amount'].to_numpy(),
+        _df['Category'].cat.codes.to_numpy(),
+        len(categories),
+        _df['Tags'].cat.codes.to_numpy(),
+        len(tags),
+    )
+    # Debits are strictly positive, so a non-zero total means the group has rows
+    tag_sum = pd.DataFrame({'Tags': tags[tag_totals > 0], 'Abs Amount': tag_totals[tag_totals > 0]})
+    category_sum = pd.DataFrame({'Category': categories[cat_totals > 0], 'Abs Amount': cat_totals[cat_totals > 0]})
+    return credits, debits, tag_sum, category_sum
+
+# Pie figures built straight from the aggregated values, skipping Plotly Express'
+# DataFrame handling. Not cached: building the figure is cheaper than unpickling it.
+def pie_figure(labels, values, title):
+    fig = go.Figure(go.Pie(labels=labels, values=values, textinfo='value+label'))
+    fig.update_layout(title=title, legend_tracegroupgap=0)
+    return fig
+
+# Widgets below run as fragments: toggling the raw view or editing a cell
+# reruns only that fragment instead of rebuilding every chart.
+@st.fragment
+def show_raw_data(df):
+    if st.checkbox("Show raw data"):
+        st.subheader("Raw Data")
+        raw_df = df.drop(columns=['Abs Amount', 'Is Debit'])
+        # Sign of the amount (-1, 0, 1) indexes a color lookup; the row colors are
+        # broadcast across all columns and applied to the table in one call
+        sign = np.sign(np.nan_to_num(raw_df['Amount'].to_numpy())).astype(int) + 1
+        row_colors = np.array(['color: red', '', 'color: green'])[sign]
+        styles = pd.DataFrame(
+            np.broadcast_to(row_colors[:, None], raw_df.shape),
+            index=raw_df.index,
+            columns=raw_df.columns,
+        )
+        st.dataframe(raw_df.style.apply(lambda _: styles, axis=None), use_container_width=True)
+
+@st.fragment
+def edit_unclassified(uncat):
+    st.subheader("Unclassified Transactions (Assign Category)")
+    categories_list = list(categories_keywords.keys())
+    edited_uncat = st.data_editor(
+        uncat[['Date', 'Transaction Details', 'Abs Amount', 'Tags', 'Category']],
+        column_config={
+            "Category": st.column_config.SelectboxColumn(
+                "Category",
+                options=categories_list,
+                required=True,
+            )
+        },
+        disabled=["Date", "Transaction Details", "Abs Amount", "Tags"],
+        hide_index=False,
+        key="uncat_editor"
+    )
+    if st.button("Update Categories"):
+        changed = edited_uncat[edited_uncat['Category'] != 'Other']
+        st.session_state.df.loc[changed.index, 'Category'] = changed['Category'].values
+        st.session_state.df_token = uuid.uuid4().hex
+        st.rerun()
+
+if uploaded_file is not None:
+    try:
+        df = load_and_prepare(uploaded_file.getvalue())
+    except ValueError as e:
+        st.error(str(e))
+        st.stop()
     
     # Store df in session state for editing
     if 'df' not in st.session_state:
         st.session_state.df = df
+        st.session_state.df_token = uuid.uuid4().hex
+        # Filter bounds and options, computed once per upload instead of every rerun
+        st.session_state.meta = SimpleNamespace(
+            min_date=df['Date'].min().date(),
+            max_date=df['Date'].max().date(),
+            min_amount=float(df['Amount'].min()),
+            max_amount=float(df['Amount'].max()),
+            categories=tuple(sorted(df['Category'].cat.categories)),
+        )
     
     df = st.session_state.df
+    meta = st.session_state.meta
     
     # Display raw data with color coding
-    if st.checkbox("Show raw data"):
-        st.subheader("Raw Data")
-        def color_row(row):
-            if row['Amount'] > 0:
-                return ['color: green'] * len(row)
-            elif row['Amount'] < 0:
-                return ['color: red'] * len(row)
-            else:
-                return [''] * len(row)
-        st.dataframe(df.style.apply(color_row, axis=1), use_container_width=True)
+    show_raw_data(df)
     
     # Sidebar for filters
     st.sidebar.header("Filters")
     
     # Date range filter
-    min_date = df['Date'].min().date()
-    max_date = df['Date'].max().date()
+    min_date, max_date = meta.min_date, meta.max_date
     start_date = st.sidebar.date_input("Start Date", min_date, min_value=min_date, max_value=max_date)
     end_date = st.sidebar.date_input("End Date", max_date, min_value=min_date, max_value=max_date)
-    df_filtered = df[(df['Date'].dt.date >= start_date) & (df['Date'].dt.date <= end_date)]
     
     # Category filter (multi-select)
-    all_categories = sorted(df['Category'].unique())
-    selected_categories = st.sidebar.multiselect("Select Categories", all_categories, default=all_categories)
-    if selected_categories:
-        df_filtered = df_filtered[df_filtered['Category'].isin(selected_categories)]
+    selected_categories = st.sidebar.multiselect("Select Categories", meta.categories, default=meta.categories)
     
     # Amount range filter
-    min_amount = float(df['Amount'].min())
-    max_amount = float(df['Amount'].max())
+    min_amount, max_amount = meta.min_amount, meta.max_amount
     amount_range = st.sidebar.slider("Amount range", min_amount, max_amount, (min_amount, max_amount))
-    df_filtered = df_filtered[(df_filtered['Amount'] >= amount_range[0]) & (df_filtered['Amount'] <= amount_range[1])]
     
-    # Compute credits and debits
-    credits = df_filtered[df_filtered['Amount'] > 0]['Amount'].sum()
-    debits = abs(df_filtered[df_filtered['Amount'] < 0]['Amount'].sum())
+    # Build a single mask from all filters and slice once.
+    # Dates compare as datetime64 against [start, end + 1 day) to avoid boxing every row to a date.
+    start64 = pd.Timestamp(start_date).to_datetime64()
+    end64 = (pd.Timestamp(end_date) + pd.Timedelta(days=1)).to_datetime64()
+    dates = df['Date'].values
+    amounts = df['Amount'].values
+    mask = (dates >= start64) & (dates < end64) & (amounts >= amount_range[0]) & (amounts <= amount_range[1])
+    if selected_categories:
+        selected_codes = df['Category'].cat.categories.get_indexer(selected_categories)
+        mask &= np.isin(df['Category'].cat.codes.values, selected_codes)
+    df_filtered = df.loc[mask]
+    
+    # Prepare expenditures dataframe
+    exp_df = df_filtered.loc[df_filtered['Is Debit'], ['Date', 'Transaction Details', 'Abs Amount', 'Tags', 'Category']]
+    
+    # Compute credits, debits and expenditure totals
+    filter_key = (st.session_state.df_token, start_date, end_date, tuple(selected_categories), amount_range)
+    if numba is not None and len(df) > jit_row_threshold:
+        credits, debits, tag_sum, category_sum = aggregate_expenditures_jit(df, mask, filter_key)
+    else:
+        filtered_amounts = df_filtered['Amount'].to_numpy()
+        credits = filtered_amounts.clip(min=0).sum()
+        debits = abs(filtered_amounts.clip(max=0).sum())
+        tag_sum, category_sum = aggregate_expenditures(exp_df, filter_key)
     
     # Display credited and debited at the top with color
     col1, col2 = st.columns(2)
@@ -113,28 +274,20 @@ if uploaded_file is not None:
     with col2:
         st.markdown(f"<h2 style='color: red;'>Total Debited: ₹{debits:,.2f}</h2>", unsafe_allow_html=True)
     
-    # Prepare expenditures dataframe
-    exp_df = df_filtered[df_filtered['Amount'] < 0].copy()
-    exp_df['Abs Amount'] = -exp_df['Amount']
-    
     # Visual 1: Pie chart of expenditures by Tags
     st.subheader("Expenditures by Tags (Pie Chart)")
-    tag_sum = exp_df.groupby('Tags')['Abs Amount'].sum().reset_index()
-    fig_pie_tags = px.pie(tag_sum, values='Abs Amount', names='Tags', title="Breakdown by Tags")
-    fig_pie_tags.update_traces(textinfo='value+label')
+    fig_pie_tags = pie_figure(tag_sum['Tags'], tag_sum['Abs Amount'], "Breakdown by Tags")
     st.plotly_chart(fig_pie_tags, use_container_width=True)
     
     # Visual 2: Pie chart of expenditures by auto Category
     st.subheader("Expenditures by Auto Category (Pie Chart)")
-    category_sum = exp_df.groupby('Category')['Abs Amount'].sum().reset_index()
-    fig_pie_cat = px.pie(category_sum, values='Abs Amount', names='Category', title="Breakdown by Auto Categories")
-    fig_pie_cat.update_traces(textinfo='value+label')
+    fig_pie_cat = pie_figure(category_sum['Category'], category_sum['Abs Amount'], "Breakdown by Auto Categories")
     st.plotly_chart(fig_pie_cat, use_container_width=True)
     
     
     # Table of top debits
     st.subheader("Top 10 Debits")
-    top_tx = exp_df.sort_values('Abs Amount', ascending=False).head(10)
+    top_tx = exp_df.nlargest(10, 'Abs Amount')
     def color_debit(row):
         return ['color: red'] * len(row)
     st.dataframe(top_tx[['Date', 'Transaction Details', 'Abs Amount', 'Tags', 'Category']].style.apply(color_debit, axis=1))
@@ -142,25 +295,6 @@ if uploaded_file is not None:
     # Unclassified transactions editor
     uncat = exp_df[exp_df['Category'] == 'Other'].copy()
     if not uncat.empty:
-        st.subheader("Unclassified Transactions (Assign Category)")
-        categories_list = list(categories_keywords.keys())
-        edited_uncat = st.data_editor(
-            uncat[['Date', 'Transaction Details', 'Abs Amount', 'Tags', 'Category']],
-            column_config={
-                "Category": st.column_config.SelectboxColumn(
-                    "Category",
-                    options=categories_list,
-                    required=True,
-                )
-            },
-            disabled=["Date", "Transaction Details", "Abs Amount", "Tags"],
-            hide_index=False,
-            key="uncat_editor"
-        )
-        if st.button("Update Categories"):
-            for idx, row in edited_uncat.iterrows():
-                if row['Category'] != 'Other':
-                    st.session_state.df.loc[idx, 'Category'] = row['Category']
-            st.rerun()
+        edit_unclassified(uncat)
 else:
     st.info("Please upload a CSV file to begin analysis. The file should have columns: Date, Transaction Details, Amount, Tags.")
\ No newline at end of file